@@ -2,40 +2,80 @@ import os
 import requests
 from google.generativeai import GenerativeModel, configure
 import streamlit as st
-from sqlalchemy import create_engine, Column, Integer, String, DateTime
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
 import json
-from datetime import datetime
-from main import run_simulation
-from iam_analyzer import analyze_iam
-from kafka_explainer import analyze_kafka
-from infra_summarizer import summarize_infra, simulate_pr_review
-from decision_engine import process_incident
-from action_generator import generate_action_content, send_teams_notification
+from datetime import datetime, timedelta
+from infra_summarizer import simulate_pr_review
+from incident_store import (
+    Incident, Session, update_incident_status,
+    incident_counts, resolution_latency, top_findings
+)
+from job_queue import get_queue, latest_job
 import pandas as pd
 
 # Configure Gemini API
 configure(api_key=os.getenv('GEMINI_API_KEY'))
 gemini_model = GenerativeModel('gemini-2.0-flash')
 
-# Database setup
-Base = declarative_base()
-class Incident(Base):
-    __tablename__ = 'incidents'
-    id = Column(Integer, primary_key=True)
-    type = Column(String)
-    timestamp = Column(DateTime, default=datetime.utcnow)
-    findings = Column(String)
-    suggestions = Column(String)
-    action = Column(String)
-    status = Column(String, default='pending')
-
-engine = create_engine('sqlite:///infraguard.db')
-Base.metadata.create_all(engine)
-Session = sessionmaker(bind=engine)
+# Database setup and background workers
+job_queue = get_queue()
 session = Session()
 
+def stream_to(placeholder, label):
+    """Return an on_token callback that renders streamed text into a placeholder."""
+    chunks = []
+    def on_token(text):
+        chunks.append(text)
+        placeholder.markdown(f"**{label}:** {''.join(chunks)}")
+    return on_token
+
+def render_analysis(analysis, decision):
+    """Render the findings, suggestions and decision for one incident."""
+    st.markdown("**Findings:**")
+    for finding in analysis['findings']:
+        st.markdown(f"- {finding}")
+    st.markdown("**Suggestions:**")
+    for suggestion in analysis['suggestions']:
+        st.markdown(f"- {suggestion}")
+    st.markdown(f"**Action:** {decision['action']}")
+    if "validation" in decision:
+        st.markdown(f"**Validation:** {decision['validation']}")
+    if "notification" in decision:
+        st.markdown(f"**Notification:** {decision['notification']}")
+
+def render_job(job):
+    """Render a finished job's result or error."""
+    st.caption(f"Job {job.id} | Status: {job.status}")
+    if job.status == 'failed':
+        st.error(f"Job {job.id} failed: {job.error}")
+        return
+    result = json.loads(job.result)
+    if "results" in result:
+        for item in result['results']:
+            st.subheader(f"Incident Type: {item['type']}")
+            render_analysis(item['analysis'], item['decision'])
+    else:
+        render_analysis(result['analysis'], result['decision'])
+
+@st.fragment(run_every=2)
+def poll_job(source):
+    """Poll an unfinished job's progress, rerunning the app once it finishes so polling stops."""
+    job = latest_job(source)
+    if job.status in ('done', 'failed'):
+        st.rerun()
+    st.caption(f"Job {job.id} | Status: {job.status}")
+    if job.stage:
+        st.markdown(f"**{job.stage}:** {job.progress or '...'}")
+
+def show_latest_job(source):
+    """Render the latest background job for a source, polling only while it is unfinished."""
+    job = latest_job(source)
+    if job is None:
+        return
+    if job.status in ('done', 'failed'):
+        render_job(job)
+    else:
+        poll_job(source)
+
 # Streamlit UI
 if 'authenticated' not in st.session_state:
     st.session_state.authenticated = False
@@ -63,26 +103,8 @@ else:
 
     # Run Simulation
     if st.button("Run Full Simulation"):
-        results = run_simulation()
-        for result in results:
-            incident = Incident(
-                type=result['type'],
-                findings=json.dumps(result['analysis']['findings']),
-                suggestions=json.dumps(result['analysis']['suggestions']),
-                action=result['decision']['action']
-            )
-            session.add(incident)
-            session.commit()
-            st.subheader(f"Incident Type: {result['type']}")
-            st.markdown("**Findings:**")
-            for finding in result['analysis']['findings']:
-                st.markdown(f"- {finding}")
-            st.markdown("**Suggestions:**")
-            for suggestion in result['analysis']['suggestions']:
-                st.markdown(f"- {suggestion}")
-            st.markdown(f"**Action:** {result['decision']['action']}")
-            if "notification" in result['decision']:
-                st.markdown(f"**Notification:** {result['decision']['notification']}")
+        job_queue.enqueue("simulation")
+    show_latest_job("simulation")
 
     # IAM Analysis Section
     with st.expander("IAM Policy Analysis"):
@@ -96,24 +118,8 @@ else:
             key="iam_role"
         )
         if st.button("Analyze IAM"):
-            analysis = analyze_iam([role_name] if role_name else None)
-            decision = process_incident("iam", analysis)
-            incident = Incident(
-                type="iam",
-                findings=json.dumps(analysis['findings']),
-                suggestions=json.dumps(analysis['suggestions']),
-                action=decision['action']
-            )
-            session.add(incident)
-            session.commit()
-            st.markdown("**Findings:**")
-            for finding in analysis['findings']:
-                st.markdown(f"- {finding}")
-            st.markdown("**Suggestions:**")
-            for suggestion in analysis['suggestions']:
-                st.markdown(f"- {suggestion}")
-            st.markdown(f"**Action:** {decision['action']}")
-            st.markdown(f"**Validation:** {decision['validation']}")
+            job_queue.enqueue("iam", {"role_names": [role_name] if role_name else None})
+        show_latest_job("iam")
 
     # Kafka Analysis Section
     with st.expander("Kafka Lag Analysis"):
@@ -128,24 +134,8 @@ else:
             help="Specify the number of synthetic Kafka log entries to generate for analysis."
         )
         if st.button("Analyze Kafka"):
-            analysis = analyze_kafka(num_entries)
-            decision = process_incident("kafka", analysis)
-            incident = Incident(
-                type="kafka",
-                findings=json.dumps(analysis['findings']),
-                suggestions=json.dumps(analysis['suggestions']),
-                action=decision['action']
-            )
-            session.add(incident)
-            session.commit()
-            st.markdown("**Findings:**")
-            for finding in analysis['findings']:
-                st.markdown(f"- {finding}")
-            st.markdown("**Suggestions:**")
-            for suggestion in analysis['suggestions']:
-                st.markdown(f"- {suggestion}")
-            st.markdown(f"**Action:** {decision['action']}")
-            st.markdown(f"**Validation:** {decision['validation']}")
+            job_queue.enqueue("kafka", {"num_entries": int(num_entries)})
+        show_latest_job("kafka")
 
     # Infra Analysis Section
     with st.expander("Infra Change Analysis"):
@@ -165,24 +155,8 @@ else:
             help="Enter the pull request number to analyze."
         )
         if st.button("Analyze Infra"):
-            analysis = summarize_infra(repo_name, pr_number)
-            decision = process_incident("infra", analysis)
-            incident = Incident(
-                type="infra",
-                findings=json.dumps(analysis['findings']),
-                suggestions=json.dumps(analysis['suggestions']),
-                action=decision['action']
-            )
-            session.add(incident)
-            session.commit()
-            st.markdown("**Findings:**")
-            for finding in analysis['findings']:
-                st.markdown(f"- {finding}")
-            st.markdown("**Suggestions:**")
-            for suggestion in analysis['suggestions']:
-                st.markdown(f"- {suggestion}")
-            st.markdown(f"**Action:** {decision['action']}")
-            st.markdown(f"**Validation:** {decision['validation']}")
+            job_queue.enqueue("infra", {"repo_name": repo_name, "pr_number": int(pr_number)})
+        show_latest_job("infra")
 
     # PR Simulation Section
     with st.expander("PR Simulation"):
@@ -202,14 +176,51 @@ else:
             help="Enter the pull request number to simulate."
         )
         if st.button("Simulate PR Review"):
-            review_response = simulate_pr_review(pr_repo_name, pr_number_sim)
-            st.write(f"**Review Response:** {review_response}")
+            review_area = st.empty()
+            review_response = simulate_pr_review(
+                pr_repo_name,
+                pr_number_sim,
+                on_token=stream_to(review_area, "Review Response")
+            )
+            review_area.markdown(f"**Review Response:** {review_response}")
             with open('infraguard.log', 'r') as log_file:
                 st.text("**Log Output:**\n" + log_file.read())
 
     # Incident Dashboard
     st.subheader("Incident Dashboard")
 
+    # Analytics, read from rollup tables maintained on insert and status change
+    type_filter = st.selectbox("Incident Type", ["All", "iam", "kafka", "infra"], key="analytics_type")
+    window_hours = st.selectbox(
+        "Time Window",
+        [24, 168, 720],
+        format_func=lambda hours: f"Last {hours // 24} day(s)",
+        key="analytics_window"
+    )
+    incident_type = None if type_filter == "All" else type_filter
+    counts = pd.DataFrame(
+        incident_counts(datetime.utcnow() - timedelta(hours=window_hours), incident_type),
+        columns=["Hour", "Type", "Status", "Count"]
+    )
+    if counts.empty:
+        st.info("No incidents in this window.")
+    else:
+        st.markdown("**Incidents per Hour by Status:**")
+        st.bar_chart(counts.pivot_table(index="Hour", columns="Status", values="Count", aggfunc="sum"))
+        st.markdown("**Incidents by Type and Status:**")
+        st.dataframe(counts.pivot_table(index="Type", columns="Status", values="Count", aggfunc="sum", fill_value=0))
+    latency = resolution_latency(incident_type)
+    if latency:
+        st.markdown("**Average Time to Resolution:**")
+        st.dataframe(pd.DataFrame(
+            [(inc_type, status, round(seconds / 60, 1)) for (inc_type, status), seconds in latency.items()],
+            columns=["Type", "Status", "Minutes"]
+        ))
+    findings = top_findings(10, incident_type)
+    if findings:
+        st.markdown("**Top Recurring Findings:**")
+        st.dataframe(pd.DataFrame(findings, columns=["Type", "Finding", "Count"]))
+
     # Download Incident Log
     all_incidents = session.query(Incident).all()
     incident_data = []
@@ -237,11 +248,13 @@ else:
     for inc in incidents:
         st.markdown(f"**ID:** {inc.id} | **Type:** {inc.type} | **Action:** {inc.action} | **Status:** {inc.status}")
         if st.button("Approve", key=f"approve_{inc.id}"):
-            inc.status = "approved"
-            session.commit()
-            st.success(f"Incident {inc.id} approved")
+            if update_incident_status(session, inc, "approved"):
+                st.success(f"Incident {inc.id} approved")
+            else:
+                st.warning(f"Incident {inc.id} was already {inc.status}")
         if inc.action == "Suggest action":
             if st.button("Decline", key=f"decline_{inc.id}"):
-                inc.status = "declined"
-                session.commit()
-                st.success(f"Incident {inc.id} declined")
\ No newline at end of file
+                if update_incident_status(session, inc, "declined"):
+                    st.success(f"Incident {inc.id} declined")
+                else:
+                    st.warning(f"Incident {inc.id} was already {inc.status}")
\ No newline at end of file
@@ -0,0 +1,13 @@
+import pytest
+from sqlalchemy import create_engine
+import incident_store
+
+@pytest.fixture(autouse=True)
+def temp_db(tmp_path, monkeypatch):
+    """Point the shared session at a fresh SQLite file for each test."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    incident_store.Base.metadata.create_all(engine)
+    monkeypatch.setattr(incident_store, "engine", engine)
+    monkeypatch.setattr(incident_store.Session, "kw", {**incident_store.Session.kw, "bind": engine})
+    yield engine
+    engine.dispose()
@@ -1,6 +1,8 @@
 from google.generativeai import GenerativeModel, configure
 import os
-from langchain.memory import ConversationBufferMemory
+import threading
+from llm_streaming import generate_text
+from langchain.memory import ConversationBufferWindowMemory
 import logging
 
 # Configure logging
@@ -12,8 +14,6 @@ configure(api_key=os.getenv('GEMINI_API_KEY'))
 gemini_model = GenerativeModel('gemini-2.0-flash')
 
 
-memory = ConversationBufferMemory(memory_key="chat_history")
-
 # Configuration
 CONFIG = {
     "risk_scores": {
@@ -22,9 +22,15 @@ CONFIG = {
         "infra": {"low": 1, "medium": 3, "high": 5}
     },
     "execute_threshold": 5,
-    "escalate_threshold": 3
+    "escalate_threshold": 3,
+    "memory_window": 5
 }
 
+# Keep only the last few decisions so prompts stay bounded in long-running processes
+memory = ConversationBufferWindowMemory(memory_key="chat_history", k=CONFIG["memory_window"])
+# LangChain memory is not thread-safe; the job queue calls process_incident from several workers
+memory_lock = threading.Lock()
+
 def score_risk(incident_type, severity):
     """Score the risk of an issue based on type and severity."""
     return CONFIG["risk_scores"].get(incident_type.lower(), {}).get(severity.lower(), 0)
@@ -37,10 +43,11 @@ def decide_action(risk_score):
         return "Escalate to team"
     return "Suggest action"
 
-def validate_decision(incident_type, analysis, action):
+def validate_decision(incident_type, analysis, action, on_token=None):
     """
     Use Gemini API to validate the decision logic.
     Fine-tuned prompt for incident response validation.
+    Streams the response through on_token when provided.
     """
     prompt = (
         "You are an incident response expert. Given the following incident details and proposed action, "
@@ -49,14 +56,18 @@ def validate_decision(incident_type, analysis, action):
         f"Proposed Action: {action}\n\n"
         "Provide a concise validation or correction in plain text."
     )
-    response = gemini_model.generate_content(prompt)
-    return response.text
+    return generate_text(gemini_model, prompt, on_token)
+
+def process_incident(incident_type, analysis, on_action_token=None, on_validation_token=None):
+    """
+    Process an incident with memory and decide on an action.
+    The action and validation texts are streamed through the optional callbacks.
+    """
+    # Memory is only touched under the lock; the LLM call runs outside it so workers stay concurrent
+    with memory_lock:
+        # Retrieve past incidents from memory
+        past_incidents = memory.load_memory_variables({"incident_type": incident_type}).get("chat_history", "")
 
-def process_incident(incident_type, analysis):
-    """Process an incident with memory and decide on an action."""
-    # Retrieve past incidents from memory
-    past_incidents = memory.load_memory_variables({"incident_type": incident_type}).get("chat_history", "")
-    
     # Include past incidents in decision-making
     prompt = (
         f"Given past incidents: {past_incidents}\n"
@@ -66,19 +77,19 @@ def process_incident(incident_type, analysis):
     )
     
     # Use Gemini to decide action
-    response = gemini_model.generate_content(prompt)
-    action = response.text.strip()
+    action = generate_text(gemini_model, prompt, on_action_token).strip()
+
+    # Store the incident and decision in memory, without the history already in the prompt
+    with memory_lock:
+        memory.save_context(
+            {"input": f"Incident Type: {incident_type}\nFindings: {', '.join(analysis['findings'])}"},
+            {"output": action}
+        )
     
     # Calculate risk score for consistency
     severity = "high" if any("risk" in f.lower() or "high" in f.lower() for f in analysis["findings"]) else "low"
     risk = score_risk(incident_type, severity)
-    validation = validate_decision(incident_type, analysis, action)
-    
-    # Store the decision in memory
-    memory.save_context(
-        {"input": prompt},
-        {"output": action}
-    )
+    validation = validate_decision(incident_type, analysis, action, on_validation_token)
     
     # Log the decision
     logging.info(f"Incident Processed - Type: {incident_type}, Action: {action}, Risk: {risk}")
@@ -2,6 +2,7 @@ import boto3
 import json
 import os
 from google.generativeai import GenerativeModel, configure
+from llm_streaming import generate_text
 
 # Configure Gemini API
 configure(api_key=os.getenv('GEMINI_API_KEY'))
@@ -44,6 +45,57 @@ def fetch_iam_policies(role_names=None):
         print(f"Failed to fetch IAM policies: {e}")
         return None
 
+def fetch_iam_policy_versions(role_names=None):
+    """
+    Fetch the default version ID of each policy attached to the specified roles, or all roles.
+    Returns a dict of policy ARN to version ID, or None if the fetch fails.
+    """
+    try:
+        iam = boto3.client(
+            'iam',
+            aws_access_key_id=os.getenv('AWS_ACCESS_KEY_ID'),
+            aws_secret_access_key=os.getenv('AWS_SECRET_ACCESS_KEY')
+        )
+        if not role_names:
+            role_names = [
+                role['RoleName']
+                for page in iam.get_paginator('list_roles').paginate()
+                for role in page['Roles']
+            ]
+        versions = {}
+        for role_name in role_names:
+            attached_policies = iam.list_attached_role_policies(RoleName=role_name)
+            for policy in attached_policies['AttachedPolicies']:
+                # A managed policy attached to several roles only needs one lookup
+                if policy['PolicyArn'] in versions:
+                    continue
+                versions[policy['PolicyArn']] = iam.get_policy(
+                    PolicyArn=policy['PolicyArn']
+                )['Policy']['DefaultVersionId']
+        return versions
+    except Exception as e:
+        print(f"Failed to fetch IAM policy versions: {e}")
+        return None
+
+def fetch_iam_policy_documents(versions):
+    """
+    Fetch policy documents for a dict of policy ARN to version ID.
+    Returns None if the fetch fails.
+    """
+    try:
+        iam = boto3.client(
+            'iam',
+            aws_access_key_id=os.getenv('AWS_ACCESS_KEY_ID'),
+            aws_secret_access_key=os.getenv('AWS_SECRET_ACCESS_KEY')
+        )
+        return [
+            iam.get_policy_version(PolicyArn=arn, VersionId=version_id)['PolicyVersion']['Document']
+            for arn, version_id in versions.items()
+        ]
+    except Exception as e:
+        print(f"Failed to fetch IAM policy documents: {e}")
+        return None
+
 def analyze_iam_policies(policies):
     """
     Analyze IAM policies for over-permissive actions.
@@ -56,10 +108,11 @@ def analyze_iam_policies(policies):
                 findings.append(f"High risk: Over-permissive statement: {json.dumps(statement)}")
     return findings
 
-def suggest_least_privilege_policy(findings):
+def suggest_least_privilege_policy(findings, on_token=None):
     """
     Use Gemini API to suggest least-privilege policy changes based on detailed findings.
     Returns original policy, suggested policy, and reasoning.
+    Streams the response through on_token when provided.
     """
     if not findings:
         return ["No changes needed."]
@@ -72,8 +125,7 @@ def suggest_least_privilege_policy(findings):
         "Format your response clearly, referencing each finding. Here are the findings:\n\n"
         + "\n\n".join(findings)
     )
-    response = gemini_model.generate_content(prompt)
-    return [response.text]
+    return [generate_text(gemini_model, prompt, on_token)]
 
 # Hardcoded fallback policy
 SAMPLE_IAM_POLICY = {
@@ -87,7 +139,7 @@ SAMPLE_IAM_POLICY = {
     ]
 }
 
-def analyze_iam(role_names=None):
+def analyze_iam(role_names=None, on_token=None):
     """
     Main function to analyze IAM policies with fallback and Gemini suggestions.
     """
@@ -96,7 +148,7 @@ def analyze_iam(role_names=None):
         print("AWS fetch failed. Falling back to hardcoded sample policy.")
         policies = [SAMPLE_IAM_POLICY]
     findings = analyze_iam_policies(policies)
-    suggestions = suggest_least_privilege_policy(findings)
+    suggestions = suggest_least_privilege_policy(findings, on_token)
     return {
         "findings": findings or ["No issues found."],
         "suggestions": suggestions
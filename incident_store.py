@@ -0,0 +1,177 @@
+import json
+import hashlib
+from datetime import datetime
+from sqlalchemy import create_engine, update, Column, Integer, Float, String, DateTime, Text
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import sessionmaker
+
+# Database setup
+Base = declarative_base()
+class Incident(Base):
+    __tablename__ = 'incidents'
+    id = Column(Integer, primary_key=True)
+    type = Column(String)
+    timestamp = Column(DateTime, default=datetime.utcnow)
+    findings = Column(String)
+    suggestions = Column(String)
+    action = Column(String)
+    status = Column(String, default='pending')
+
+# Rollups, maintained incrementally so dashboard analytics never scan incidents
+class IncidentCount(Base):
+    __tablename__ = 'incident_counts'
+    hour = Column(DateTime, primary_key=True)
+    type = Column(String, primary_key=True)
+    status = Column(String, primary_key=True)
+    count = Column(Integer, default=0)
+
+class ResolutionLatency(Base):
+    __tablename__ = 'resolution_latency'
+    type = Column(String, primary_key=True)
+    status = Column(String, primary_key=True)
+    count = Column(Integer, default=0)
+    total_seconds = Column(Float, default=0.0)
+
+class FindingCount(Base):
+    __tablename__ = 'finding_counts'
+    type = Column(String, primary_key=True)
+    fingerprint = Column(String, primary_key=True)
+    finding = Column(Text)
+    count = Column(Integer, default=0, index=True)
+    last_seen = Column(DateTime)
+
+# Shared between the Streamlit script and background worker threads
+engine = create_engine('sqlite:///infraguard.db', connect_args={"check_same_thread": False})
+Session = sessionmaker(bind=engine)
+
+def hour_bucket(timestamp):
+    """Truncate a timestamp to the start of its hour."""
+    return timestamp.replace(minute=0, second=0, microsecond=0)
+
+def _bump_count(session, timestamp, incident_type, status, delta):
+    # Upserts keep increments atomic across worker threads and the monitor process
+    session.execute(
+        insert(IncidentCount)
+        .values(hour=hour_bucket(timestamp), type=incident_type, status=status, count=delta)
+        .on_conflict_do_update(
+            index_elements=['hour', 'type', 'status'],
+            set_={"count": IncidentCount.count + delta}
+        )
+    )
+
+def _bump_latency(session, incident_type, status, seconds):
+    session.execute(
+        insert(ResolutionLatency)
+        .values(type=incident_type, status=status, count=1, total_seconds=seconds)
+        .on_conflict_do_update(
+            index_elements=['type', 'status'],
+            set_={
+                "count": ResolutionLatency.count + 1,
+                "total_seconds": ResolutionLatency.total_seconds + seconds
+            }
+        )
+    )
+
+def _bump_findings(session, incident_type, findings, timestamp):
+    for finding in set(findings):
+        session.execute(
+            insert(FindingCount)
+            .values(
+                type=incident_type,
+                fingerprint=hashlib.sha1(finding.encode()).hexdigest(),
+                finding=finding,
+                count=1,
+                last_seen=timestamp
+            )
+            .on_conflict_do_update(
+                index_elements=['type', 'fingerprint'],
+                set_={"count": FindingCount.count + 1, "last_seen": timestamp}
+            )
+        )
+
+def rebuild_rollups():
+    """Recompute all rollups from the incidents table. Only needed to backfill existing history."""
+    with Session() as session:
+        for table in (IncidentCount, ResolutionLatency, FindingCount):
+            session.query(table).delete()
+        for incident in session.query(Incident).yield_per(500):
+            _bump_count(session, incident.timestamp, incident.type, incident.status, 1)
+            _bump_findings(session, incident.type, json.loads(incident.findings or '[]'), incident.timestamp)
+        session.commit()
+
+def init_db():
+    """Create all tables registered on Base and backfill rollups for pre-existing incidents."""
+    Base.metadata.create_all(engine)
+    with Session() as session:
+        needs_backfill = (
+            session.query(IncidentCount).first() is None
+            and session.query(Incident).first() is not None
+        )
+    if needs_backfill:
+        rebuild_rollups()
+
+def save_incident(incident_type, analysis, decision):
+    """Persist an analyzed incident, update its rollups and return its ID."""
+    with Session() as session:
+        incident = Incident(
+            type=incident_type,
+            timestamp=datetime.utcnow(),
+            findings=json.dumps(analysis['findings']),
+            suggestions=json.dumps(analysis['suggestions']),
+            action=decision['action'],
+            status='pending'
+        )
+        session.add(incident)
+        _bump_count(session, incident.timestamp, incident_type, incident.status, 1)
+        _bump_findings(session, incident_type, analysis['findings'], incident.timestamp)
+        session.commit()
+        return incident.id
+
+def update_incident_status(session, incident, status):
+    """
+    Change an incident's status and move it between rollup buckets in the same commit.
+    The update only applies if the stored status still matches the one this session saw,
+    so a stale session cannot double-count. Returns True if the status was changed.
+    """
+    old_status = incident.status
+    if old_status == status:
+        return False
+    result = session.execute(
+        update(Incident)
+        .where(Incident.id == incident.id, Incident.status == old_status)
+        .values(status=status)
+        .execution_options(synchronize_session=False)
+    )
+    changed = result.rowcount == 1
+    if changed:
+        _bump_count(session, incident.timestamp, incident.type, old_status, -1)
+        _bump_count(session, incident.timestamp, incident.type, status, 1)
+        _bump_latency(session, incident.type, status, (datetime.utcnow() - incident.timestamp).total_seconds())
+    session.commit()
+    return changed
+
+def incident_counts(since, incident_type=None):
+    """Return hourly (hour, type, status, count) rollup rows from since onwards."""
+    with Session() as session:
+        query = session.query(IncidentCount).filter(IncidentCount.hour >= hour_bucket(since))
+        if incident_type:
+            query = query.filter(IncidentCount.type == incident_type)
+        return [(row.hour, row.type, row.status, row.count) for row in query.order_by(IncidentCount.hour)]
+
+def resolution_latency(incident_type=None):
+    """Return {(type, status): average seconds from creation to approval or decline}."""
+    with Session() as session:
+        query = session.query(ResolutionLatency)
+        if incident_type:
+            query = query.filter(ResolutionLatency.type == incident_type)
+        return {(row.type, row.status): row.total_seconds / row.count for row in query if row.count}
+
+def top_findings(limit=10, incident_type=None):
+    """Return the most frequently recurring (type, finding, count) rows."""
+    with Session() as session:
+        query = session.query(FindingCount)
+        if incident_type:
+            query = query.filter(FindingCount.type == incident_type)
+        query = query.order_by(FindingCount.count.desc()).limit(limit)
+        return [(row.type, row.finding, row.count) for row in query]
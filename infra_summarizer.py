@@ -1,6 +1,8 @@
 import os
+import threading
 from github import Github
 from google.generativeai import GenerativeModel, configure
+from llm_streaming import generate_text
 from langchain.memory import ConversationBufferMemory
 import logging
 
@@ -14,6 +16,8 @@ gemini_model = GenerativeModel('gemini-2.0-flash')
 
 # Initialize LangChain memory for PR reviews
 pr_memory = ConversationBufferMemory(memory_key="pr_history")
+# Streamlit sessions run on separate threads and share this memory
+pr_memory_lock = threading.Lock()
 
 # Hardcoded fallback diff
 SAMPLE_TERRAFORM_DIFF = """
@@ -49,6 +53,19 @@ def fetch_terraform_diffs(repo_name, pr_number):
         print(f"Failed to fetch Terraform diffs: {e}")
         return None
 
+def fetch_open_pr_heads(repo_name):
+    """
+    Fetch the head commit SHA of each open PR in a GitHub repo.
+    Returns a dict of PR number to SHA, or None if the fetch fails.
+    """
+    try:
+        g = Github(os.getenv('GITHUB_TOKEN'))
+        repo = g.get_repo(repo_name)
+        return {pr.number: pr.head.sha for pr in repo.get_pulls(state='open')}
+    except Exception as e:
+        print(f"Failed to fetch open PRs: {e}")
+        return None
+
 def analyze_diff(diff_text):
     """
     Analyze Terraform diff by collecting both added and removed lines.
@@ -65,10 +82,11 @@ def analyze_diff(diff_text):
     ]
     return findings
 
-def suggest_diff_resolution(findings):
+def suggest_diff_resolution(findings, on_token=None):
     """
     Use Gemini API to suggest Terraform diff resolutions based on full diff.
     Updated prompt to consider both added and removed lines.
+    Streams the response through on_token when provided.
     """
     diff_text = "\n".join(findings[2:])  # Extract diff content from findings
     prompt = (
@@ -79,15 +97,17 @@ def suggest_diff_resolution(findings):
         f"{diff_text}\n\n"
         "Provide concise recommendations in plain text, focusing on secure configuration."
     )
-    response = gemini_model.generate_content(prompt)
-    return [response.text]
+    return [generate_text(gemini_model, prompt, on_token)]
 
-def summarize_infra(repo_name, pr_number):
+def summarize_infra(repo_name, pr_number, on_token=None, fallback=True):
     """
     Main function to summarize Terraform diffs with fallback and Gemini suggestions.
+    With fallback=False a failed fetch raises instead of analyzing the hardcoded diff.
     """
     diffs = fetch_terraform_diffs(repo_name, pr_number)
     if diffs is None:
+        if not fallback:
+            raise RuntimeError(f"Failed to fetch Terraform diffs for {repo_name}#{pr_number}")
         print("GitHub fetch failed. Falling back to hardcoded diff.")
         diffs = [SAMPLE_TERRAFORM_DIFF]
     if not diffs:
@@ -98,21 +118,24 @@ def summarize_infra(repo_name, pr_number):
     findings = []
     for diff in diffs:
         findings.extend(analyze_diff(diff))
-    suggestions = suggest_diff_resolution(findings)
+    suggestions = suggest_diff_resolution(findings, on_token)
     return {
         "findings": findings[:2] + ["See diff content below analyzed by Gemini."],
         "suggestions": suggestions
     }
 
-def simulate_pr_review(repo_name, pr_number):
+def simulate_pr_review(repo_name, pr_number, on_token=None):
     """
     Simulate a PR review with memory and logging.
+    Streams the review comment through on_token when provided.
     """
     # Analyze the PR diff
     analysis = summarize_infra(repo_name, pr_number)
     
-    # Retrieve past PR reviews from memory
-    past_reviews = pr_memory.load_memory_variables({"repo_name": repo_name}).get("pr_history", "")
+    # Memory is only touched under the lock; the LLM call runs outside it so sessions stay concurrent
+    with pr_memory_lock:
+        # Retrieve past PR reviews from memory
+        past_reviews = pr_memory.load_memory_variables({"repo_name": repo_name}).get("pr_history", "")
     
     # Simulate review with memory
     prompt = (
@@ -124,16 +147,16 @@ def simulate_pr_review(repo_name, pr_number):
     )
     
     # Use Gemini to generate review response
-    response = gemini_model.generate_content(prompt)
-    review_response = response.text.strip()
+    review_response = generate_text(gemini_model, prompt, on_token).strip()
+
+    # Store in memory
+    with pr_memory_lock:
+        pr_memory.save_context(
+            {"input": prompt},
+            {"output": review_response}
+        )
     
     # Log the review
     logging.info(f"PR Review Simulated - Repo: {repo_name}, PR: {pr_number}, Response: {review_response}")
     
-    # Store in memory
-    pr_memory.save_context(
-        {"input": prompt},
-        {"output": review_response}
-    )
-    
     return review_response
\ No newline at end of file
@@ -0,0 +1,250 @@
+import json
+import logging
+import threading
+import time
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, DateTime, Text
+from incident_store import Base, Session, init_db, save_incident
+from iam_analyzer import analyze_iam
+from kafka_explainer import analyze_kafka
+from infra_summarizer import summarize_infra
+from decision_engine import process_incident
+from main import run_simulation
+
+# Configure logging
+logging.basicConfig(filename='infraguard.log', level=logging.INFO,
+                    format='%(asctime)s - %(message)s')
+
+# Configuration
+CONFIG = {
+    "workers": 4,
+    "source_concurrency": {
+        "iam": 1,
+        "kafka": 2,
+        "infra": 2,
+        "simulation": 1
+    },
+    "poll_interval": 1.0,
+    "progress_interval": 0.5,
+    "status_retries": 3
+}
+
+# Sources whose concurrency slots a job occupies, beyond its own
+JOB_SLOTS = {
+    "simulation": ["simulation", "iam", "kafka", "infra"]
+}
+
+class Job(Base):
+    __tablename__ = 'jobs'
+    id = Column(Integer, primary_key=True)
+    source = Column(String)
+    params = Column(Text)
+    status = Column(String, default='queued')
+    stage = Column(String)
+    progress = Column(Text, default='')
+    result = Column(Text)
+    error = Column(Text)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+def update_job(job_id, **fields):
+    """Update fields on a job row."""
+    with Session() as session:
+        job = session.get(Job, job_id)
+        for name, value in fields.items():
+            setattr(job, name, value)
+        job.updated_at = datetime.utcnow()
+        session.commit()
+
+class JobProgress:
+    """
+    on_token callback that stores streamed text as job progress.
+    Writes are throttled to one per progress_interval; call flush() to write the final text.
+    """
+
+    def __init__(self, job_id, stage):
+        self.job_id = job_id
+        self.stage = stage
+        self.chunks = []
+        self.written = 0
+        self.last_write = 0.0
+
+    def __call__(self, text):
+        self.chunks.append(text)
+        if time.monotonic() - self.last_write >= CONFIG["progress_interval"]:
+            self.flush()
+
+    def flush(self):
+        if len(self.chunks) == self.written:
+            return
+        update_job(self.job_id, stage=self.stage, progress=''.join(self.chunks))
+        self.written = len(self.chunks)
+        self.last_write = time.monotonic()
+
+def run_incident_job(job_id, incident_type, analyze):
+    """Run an analysis and decision for one incident type and persist the incident."""
+    suggestions = JobProgress(job_id, "Suggestions")
+    action = JobProgress(job_id, "Action")
+    validation = JobProgress(job_id, "Validation")
+    analysis = analyze(suggestions)
+    suggestions.flush()
+    decision = process_incident(
+        incident_type,
+        analysis,
+        on_action_token=action,
+        on_validation_token=validation
+    )
+    action.flush()
+    validation.flush()
+    incident_id = save_incident(incident_type, analysis, decision)
+    return {"incident_id": incident_id, "analysis": analysis, "decision": decision}
+
+def run_simulation_job(job_id):
+    """Run the full simulation and persist every resulting incident."""
+    update_job(job_id, stage="Simulation")
+    results = run_simulation()
+    for result in results:
+        save_incident(result['type'], result['analysis'], result['decision'])
+    return {"results": results}
+
+JOB_HANDLERS = {
+    "iam": lambda job_id, params: run_incident_job(
+        job_id, "iam", lambda on_token: analyze_iam(params.get("role_names"), on_token=on_token)
+    ),
+    "kafka": lambda job_id, params: run_incident_job(
+        job_id, "kafka", lambda on_token: analyze_kafka(params.get("num_entries", 10), on_token=on_token)
+    ),
+    "infra": lambda job_id, params: run_incident_job(
+        job_id, "infra", lambda on_token: summarize_infra(params["repo_name"], params["pr_number"], on_token=on_token)
+    ),
+    "simulation": lambda job_id, params: run_simulation_job(job_id)
+}
+
+class JobQueue:
+    """
+    Worker pool that runs jobs stored in SQLite.
+    Each worker claims the oldest queued job whose source is below its concurrency cap.
+    """
+
+    def __init__(self, workers=None, source_concurrency=None):
+        self.workers = workers or CONFIG["workers"]
+        self.source_concurrency = source_concurrency or CONFIG["source_concurrency"]
+        self.running = {source: 0 for source in self.source_concurrency}
+        self.condition = threading.Condition()
+        self.stopped = threading.Event()
+        self.threads = []
+
+    def start(self):
+        """Create tables, requeue jobs interrupted by a restart and start the workers."""
+        init_db()
+        with Session() as session:
+            session.query(Job).filter(Job.status == 'running').update({"status": "queued"})
+            session.commit()
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"infraguard-worker-{i}", daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def stop(self):
+        """Stop the workers once they finish their current job."""
+        self.stopped.set()
+        with self.condition:
+            self.condition.notify_all()
+        for thread in self.threads:
+            thread.join()
+
+    def enqueue(self, source, params=None):
+        """Queue a job for a source and return its ID without waiting for it."""
+        if source not in JOB_HANDLERS:
+            raise ValueError(f"Unknown job source: {source}")
+        with Session() as session:
+            job = Job(source=source, params=json.dumps(params or {}))
+            session.add(job)
+            session.commit()
+            job_id = job.id
+        logging.info(f"Job Enqueued - ID: {job_id}, Source: {source}")
+        with self.condition:
+            self.condition.notify_all()
+        return job_id
+
+    def _claim(self):
+        """
+        Mark the next runnable job as running and return (id, source, params), or None.
+        A job is runnable only when every source it touches has a free slot.
+        """
+        with Session() as session:
+            for job in session.query(Job).filter(Job.status == 'queued').order_by(Job.id):
+                slots = JOB_SLOTS.get(job.source, [job.source])
+                if all(self.running.get(slot, 0) < self.source_concurrency.get(slot, 1) for slot in slots):
+                    job.status = 'running'
+                    job.updated_at = datetime.utcnow()
+                    session.commit()
+                    for slot in slots:
+                        self.running[slot] = self.running.get(slot, 0) + 1
+                    return job.id, job.source, json.loads(job.params)
+        return None
+
+    def _next_job(self):
+        """Block until a job can be claimed, or return None once stopped."""
+        with self.condition:
+            while not self.stopped.is_set():
+                claimed = self._claim()
+                if claimed is not None:
+                    return claimed
+                self.condition.wait(CONFIG["poll_interval"])
+        return None
+
+    def _finish(self, job_id, **fields):
+        """Write a job's final status, retrying transient failures such as a locked database."""
+        for attempt in range(1, CONFIG["status_retries"] + 1):
+            try:
+                update_job(job_id, **fields)
+                return
+            except Exception as e:
+                logging.error(f"Job Status Write Failed - ID: {job_id}, Attempt: {attempt}, Exception: {e}")
+                time.sleep(CONFIG["poll_interval"] * attempt)
+        # Left as running; start() requeues it on the next restart
+
+    def _work(self):
+        # Every failure is caught here so a worker never exits and shrinks the pool
+        while not self.stopped.is_set():
+            try:
+                claimed = self._next_job()
+            except Exception as e:
+                logging.error(f"Job Claim Failed - Exception: {e}")
+                time.sleep(CONFIG["poll_interval"])
+                continue
+            if claimed is None:
+                return
+            job_id, source, params = claimed
+            try:
+                try:
+                    result = json.dumps(JOB_HANDLERS[source](job_id, params))
+                except Exception as e:
+                    logging.error(f"Job Failed - ID: {job_id}, Source: {source}, Exception: {e}")
+                    self._finish(job_id, status='failed', error=str(e))
+                else:
+                    self._finish(job_id, status='done', result=result)
+                    logging.info(f"Job Completed - ID: {job_id}, Source: {source}")
+            finally:
+                with self.condition:
+                    for slot in JOB_SLOTS.get(source, [source]):
+                        self.running[slot] -= 1
+                    self.condition.notify_all()
+
+def latest_job(source):
+    """Return the most recent job for a source, or None."""
+    with Session() as session:
+        return session.query(Job).filter(Job.source == source).order_by(Job.id.desc()).first()
+
+_queue = None
+_queue_lock = threading.Lock()
+
+def get_queue():
+    """Return the process-wide job queue, starting it on first use."""
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = JobQueue()
+            _queue.start()
+        return _queue
@@ -3,21 +3,22 @@ import json
 import random
 from datetime import datetime, timedelta
 from google.generativeai import GenerativeModel, configure
+from llm_streaming import generate_text
 
 # Configure Gemini API
 configure(api_key=os.getenv('GEMINI_API_KEY'))
 gemini_model = GenerativeModel('gemini-2.0-flash')
 
-def generate_synthetic_kafka_logs(num_entries=10):
-    """Generate synthetic Kafka logs."""
+def generate_synthetic_kafka_logs(num_entries=10, start_offset=0):
+    """Generate synthetic Kafka logs, with offsets beginning at start_offset."""
     logs = []
     base_time = datetime.now()
     for i in range(num_entries):
         log = {
             "timestamp": (base_time + timedelta(seconds=i)).isoformat(),
             "partition": random.randint(0, 5),
-            "offset": i * 10,
-            "consumer_offset": i * 10 - random.randint(0, 20)
+            "offset": start_offset + i * 10,
+            "consumer_offset": start_offset + i * 10 - random.randint(0, 20)
         }
         logs.append(log)
     return logs
@@ -38,10 +39,11 @@ def analyze_kafka_lag(lag, threshold=100):
         findings.append("High lag detected, indicating transaction delays.")
     return findings
 
-def suggest_kafka_resolution(findings):
+def suggest_kafka_resolution(findings, on_token=None):
     """
     Use Gemini API to suggest Kafka lag resolutions.
     Fine-tuned prompt for Kafka performance optimization.
+    Streams the response through on_token when provided.
     """
     if not findings or "High lag" not in " ".join(findings):
         return ["Lag within acceptable limits."]
@@ -51,17 +53,16 @@ def suggest_kafka_resolution(findings):
         f"{'\n'.join(findings)}\n\n"
         "Provide concise recommendations in plain text, focusing on consumer optimization, partitioning, or scaling."
     )
-    response = gemini_model.generate_content(prompt)
-    return [response.text]
+    return [generate_text(gemini_model, prompt, on_token)]
 
-def analyze_kafka(num_entries=10):
+def analyze_kafka(num_entries=10, on_token=None):
     """
     Main function to analyze Kafka lag using synthetic logs and provide Gemini suggestions.
     """
     logs = generate_synthetic_kafka_logs(num_entries)
     lag = calculate_synthetic_lag(logs)
     findings = analyze_kafka_lag(lag)
-    suggestions = suggest_kafka_resolution(findings)
+    suggestions = suggest_kafka_resolution(findings, on_token)
     return {
         "findings": findings,
         "suggestions": suggestions
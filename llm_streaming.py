@@ -0,0 +1,18 @@
+def generate_text(model, prompt, on_token=None):
+    """
+    Generate text with a Gemini model, optionally streaming it.
+    When on_token is given, each chunk is passed to it as it arrives;
+    the full text is always returned for persistence.
+    """
+    if on_token is None:
+        return model.generate_content(prompt).text
+    chunks = []
+    for chunk in model.generate_content(prompt, stream=True):
+        # The final chunk may carry only a finish_reason, and .text raises on part-less chunks
+        if not chunk.parts:
+            continue
+        text = chunk.text
+        if text:
+            chunks.append(text)
+            on_token(text)
+    return "".join(chunks)
@@ -0,0 +1,213 @@
+import os
+import json
+import time
+import random
+import logging
+from datetime import datetime
+from sqlalchemy import Column, String, DateTime, Text
+from incident_store import Base, Session, init_db, save_incident
+from iam_analyzer import (
+    fetch_iam_policy_versions, fetch_iam_policy_documents,
+    analyze_iam_policies, suggest_least_privilege_policy
+)
+from kafka_explainer import (
+    generate_synthetic_kafka_logs, calculate_synthetic_lag,
+    analyze_kafka_lag, suggest_kafka_resolution
+)
+from infra_summarizer import fetch_open_pr_heads, summarize_infra
+from decision_engine import process_incident
+from action_generator import generate_action_content, send_teams_notification
+
+# Configure logging
+logging.basicConfig(filename='infraguard.log', level=logging.INFO,
+                    format='%(asctime)s - %(message)s')
+
+# Configuration (seconds)
+CONFIG = {
+    "intervals": {
+        "iam": 900,
+        "kafka": 60,
+        "infra": 300
+    },
+    "jitter": 0.1,
+    "slow_ratio": 0.5,
+    "max_backoff": 8,
+    "kafka_entries": 10,
+    "infra_repo": os.getenv('INFRAGUARD_REPO')
+}
+
+class Watermark(Base):
+    __tablename__ = 'watermarks'
+    source = Column(String, primary_key=True)
+    value = Column(Text)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+def get_watermark(source, default=None):
+    """Return the stored watermark for a source, or default if none is stored."""
+    with Session() as session:
+        watermark = session.get(Watermark, source)
+        return json.loads(watermark.value) if watermark else default
+
+def set_watermark(source, value):
+    """Store the watermark for a source."""
+    with Session() as session:
+        watermark = session.get(Watermark, source) or Watermark(source=source)
+        watermark.value = json.dumps(value)
+        watermark.updated_at = datetime.utcnow()
+        session.add(watermark)
+        session.commit()
+
+class SystemClock:
+    """Wall clock used by the daemon."""
+
+    def now(self):
+        return time.monotonic()
+
+    def sleep(self, seconds):
+        time.sleep(seconds)
+
+class FakeClock:
+    """
+    Clock that only moves when slept or advanced, for driving the scheduler in tests.
+    Like time.sleep, it rejects negative sleeps.
+    """
+
+    def __init__(self, start=0.0):
+        self.time = start
+
+    def now(self):
+        return self.time
+
+    def sleep(self, seconds):
+        if seconds < 0:
+            raise ValueError("sleep length must be non-negative")
+        self.time += seconds
+
+    def advance(self, seconds):
+        self.time += seconds
+
+def record_incident(incident_type, analysis):
+    """Decide on an incident, notify if needed and write it to the incident store."""
+    decision = process_incident(incident_type, analysis)
+    if decision["action"] == "Execute autonomous action":
+        content = generate_action_content(incident_type, analysis)
+        decision["notification"] = send_teams_notification(content)
+    incident_id = save_incident(incident_type, analysis, decision)
+    logging.info(f"Monitor Incident Recorded - Type: {incident_type}, ID: {incident_id}")
+    return incident_id
+
+def check_iam():
+    """Analyze only IAM policies whose default version changed since the last tick."""
+    versions = fetch_iam_policy_versions()
+    if versions is None:
+        raise RuntimeError("IAM policy versions unavailable")
+    seen = get_watermark("iam", {})
+    changed = {arn: version for arn, version in versions.items() if seen.get(arn) != version}
+    if changed:
+        policies = fetch_iam_policy_documents(changed)
+        if policies is None:
+            raise RuntimeError("IAM policy documents unavailable")
+        findings = analyze_iam_policies(policies)
+        if findings:
+            record_incident("iam", {
+                "findings": findings,
+                "suggestions": suggest_least_privilege_policy(findings)
+            })
+    set_watermark("iam", versions)
+    return len(changed)
+
+def check_kafka():
+    """Analyze only Kafka log entries past the last processed offset."""
+    last_offset = get_watermark("kafka")
+    start_offset = 0 if last_offset is None else last_offset + 10
+    logs = generate_synthetic_kafka_logs(CONFIG["kafka_entries"], start_offset=start_offset)
+    if not logs:
+        return 0
+    findings = analyze_kafka_lag(calculate_synthetic_lag(logs))
+    suggestions = suggest_kafka_resolution(findings)
+    if "High lag" in " ".join(findings):
+        record_incident("kafka", {"findings": findings, "suggestions": suggestions})
+    set_watermark("kafka", max(log["offset"] for log in logs))
+    return len(logs)
+
+def check_infra():
+    """Analyze only open PRs whose head SHA changed since the last tick."""
+    repo_name = CONFIG["infra_repo"]
+    if not repo_name:
+        return 0
+    heads = fetch_open_pr_heads(repo_name)
+    if heads is None:
+        raise RuntimeError("Open PRs unavailable")
+    # JSON round-trips PR numbers as strings
+    heads = {str(pr_number): sha for pr_number, sha in heads.items()}
+    seen = get_watermark("infra", {})
+    changed = [pr_number for pr_number, sha in heads.items() if seen.get(pr_number) != sha]
+    for pr_number in changed:
+        # Raises on fetch failure, leaving this PR's watermark for the next tick
+        record_incident("infra", summarize_infra(repo_name, int(pr_number), fallback=False))
+        seen[pr_number] = heads[pr_number]
+        set_watermark("infra", seen)
+    set_watermark("infra", {pr_number: seen[pr_number] for pr_number in heads})
+    return len(changed)
+
+CHECKS = {
+    "iam": check_iam,
+    "kafka": check_kafka,
+    "infra": check_infra
+}
+
+class Monitor:
+    """
+    Headless scheduler that runs each source check on its own jittered interval.
+    Checks run one at a time, so a slow LLM or source delays the others instead of piling up work;
+    a check that is slow or fails also has its own interval backed off until it recovers.
+    """
+
+    def __init__(self, clock=None, checks=None, intervals=None, rng=None):
+        self.clock = clock or SystemClock()
+        self.checks = dict(checks or CHECKS)
+        self.intervals = intervals or CONFIG["intervals"]
+        self.rng = rng or random.Random()
+        self.backoff = {source: 1 for source in self.checks}
+        now = self.clock.now()
+        self.next_run = {source: now + self._jitter(source, 0) for source in self.checks}
+
+    def _jitter(self, source, delay):
+        spread = self.intervals[source] * CONFIG["jitter"]
+        return max(delay + self.rng.uniform(-spread, spread), 0)
+
+    def _schedule(self, source, started, ok):
+        interval = self.intervals[source]
+        duration = self.clock.now() - started
+        if not ok or duration > interval * CONFIG["slow_ratio"]:
+            self.backoff[source] = min(self.backoff[source] * 2, CONFIG["max_backoff"])
+        else:
+            self.backoff[source] = 1
+        self.next_run[source] = self.clock.now() + self._jitter(source, interval * self.backoff[source])
+
+    def tick(self):
+        """Wait for the next due source, run its check and reschedule it. Returns the source."""
+        source = min(self.next_run, key=self.next_run.get)
+        # Overdue sources (at startup, or after a slow check) run immediately
+        self.clock.sleep(max(self.next_run[source] - self.clock.now(), 0))
+        started = self.clock.now()
+        try:
+            processed = self.checks[source]()
+            logging.info(f"Monitor Check - Source: {source}, Processed: {processed}")
+            ok = True
+        except Exception as e:
+            logging.error(f"Monitor Check Failed - Source: {source}, Exception: {e}")
+            ok = False
+        self._schedule(source, started, ok)
+        return source
+
+    def run(self, max_ticks=None):
+        """Run checks until stopped, or for max_ticks ticks."""
+        init_db()
+        ticks = 0
+        while max_ticks is None or ticks < max_ticks:
+            self.tick()
+            ticks += 1
+
+if __name__ == "__main__":
+    Monitor().run()
@@ -0,0 +1,11 @@
+from unittest import mock
+import iam_analyzer
+
+def test_shared_policy_version_is_fetched_once():
+    client = mock.Mock()
+    client.list_attached_role_policies.return_value = {"AttachedPolicies": [{"PolicyArn": "arn:shared"}]}
+    client.get_policy.return_value = {"Policy": {"DefaultVersionId": "v3"}}
+    with mock.patch.object(iam_analyzer.boto3, "client", return_value=client):
+        versions = iam_analyzer.fetch_iam_policy_versions(["app", "worker", "batch"])
+    assert versions == {"arn:shared": "v3"}
+    assert client.get_policy.call_count == 1
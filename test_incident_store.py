@@ -0,0 +1,33 @@
+from datetime import datetime, timedelta
+import incident_store
+from incident_store import Incident, Session, save_incident, update_incident_status
+
+def counts_by_status():
+    totals = {}
+    for hour, incident_type, status, count in incident_store.incident_counts(datetime.utcnow() - timedelta(hours=1)):
+        totals[status] = totals.get(status, 0) + count
+    return totals
+
+def test_save_incident_updates_rollups():
+    save_incident("iam", {"findings": ["A", "B", "A"], "suggestions": ["s"]}, {"action": "Suggest action"})
+    save_incident("iam", {"findings": ["A"], "suggestions": ["s"]}, {"action": "Suggest action"})
+    assert counts_by_status() == {"pending": 2}
+    assert incident_store.top_findings() == [("iam", "A", 2), ("iam", "B", 1)]
+
+def test_status_change_moves_rollup_bucket():
+    incident_id = save_incident("kafka", {"findings": ["K"], "suggestions": ["s"]}, {"action": "Suggest action"})
+    with Session() as session:
+        assert update_incident_status(session, session.get(Incident, incident_id), "approved")
+    assert counts_by_status() == {"pending": 0, "approved": 1}
+    assert list(incident_store.resolution_latency()) == [("kafka", "approved")]
+
+def test_stale_session_cannot_double_count():
+    incident_id = save_incident("iam", {"findings": ["A"], "suggestions": ["s"]}, {"action": "Suggest action"})
+    with Session() as first, Session() as second:
+        approving = first.get(Incident, incident_id)
+        declining = second.get(Incident, incident_id)
+        assert update_incident_status(first, approving, "approved")
+        assert not update_incident_status(second, declining, "declined")
+        assert declining.status == "approved"
+    assert counts_by_status() == {"pending": 0, "approved": 1}
+    assert list(incident_store.resolution_latency()) == [("iam", "approved")]
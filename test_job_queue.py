@@ -0,0 +1,95 @@
+import threading
+import time
+import pytest
+import job_queue
+from job_queue import Job, JobQueue, Session
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+def job_status(job_id):
+    with Session() as session:
+        return session.get(Job, job_id).status
+
+@pytest.fixture
+def gates(monkeypatch):
+    """Replace every job handler with one that blocks until its source's gate opens."""
+    monkeypatch.setitem(job_queue.CONFIG, "poll_interval", 0.01)
+    events = {source: threading.Event() for source in job_queue.JOB_HANDLERS}
+    for source, event in events.items():
+        monkeypatch.setitem(job_queue.JOB_HANDLERS, source, lambda job_id, params, event=event: event.wait(5) and {})
+    return events
+
+@pytest.fixture
+def queue(gates):
+    queues = []
+    def start(**kwargs):
+        q = JobQueue(**kwargs)
+        q.start()
+        queues.append(q)
+        return q
+    yield start
+    for event in gates.values():
+        event.set()
+    for q in queues:
+        q.stop()
+
+def test_per_source_cap_limits_running_jobs(queue, gates):
+    q = queue()
+    job_ids = [q.enqueue("kafka") for _ in range(3)]
+    assert wait_for(lambda: [job_status(job_id) for job_id in job_ids].count("running") == 2)
+    time.sleep(0.1)
+    assert job_status(job_ids[2]) == "queued"
+    gates["kafka"].set()
+    assert wait_for(lambda: all(job_status(job_id) == "done" for job_id in job_ids))
+
+def test_simulation_holds_iam_slot(queue, gates):
+    q = queue()
+    simulation_id = q.enqueue("simulation")
+    assert wait_for(lambda: job_status(simulation_id) == "running")
+    iam_id = q.enqueue("iam")
+    kafka_id = q.enqueue("kafka")
+    time.sleep(0.1)
+    assert job_status(iam_id) == "queued"
+    # Kafka's cap is 2, so the slot the simulation leaves free is still usable
+    assert job_status(kafka_id) == "running"
+    assert q.running["iam"] == 1
+    assert q.running["kafka"] == 2
+    gates["simulation"].set()
+    assert wait_for(lambda: job_status(iam_id) == "running")
+    gates["iam"].set()
+    gates["kafka"].set()
+    assert wait_for(lambda: job_status(iam_id) == "done" and job_status(kafka_id) == "done")
+    assert wait_for(lambda: all(count == 0 for count in q.running.values()))
+
+def test_start_requeues_interrupted_jobs(queue, gates):
+    with Session() as session:
+        job = Job(source="kafka", params="{}", status="running")
+        session.add(job)
+        session.commit()
+        job_id = job.id
+    gates["kafka"].set()
+    queue()
+    assert wait_for(lambda: job_status(job_id) == "done")
+
+def test_worker_survives_failed_status_write(queue, gates, monkeypatch):
+    real_update_job = job_queue.update_job
+    failures = []
+    def flaky_update_job(job_id, **fields):
+        if fields.get("status") == "done" and not failures:
+            failures.append(job_id)
+            raise RuntimeError("database is locked")
+        real_update_job(job_id, **fields)
+    monkeypatch.setattr(job_queue, "update_job", flaky_update_job)
+    gates["kafka"].set()
+    q = queue(workers=1)
+    first_id = q.enqueue("kafka")
+    assert wait_for(lambda: job_status(first_id) == "done")
+    second_id = q.enqueue("kafka")
+    assert wait_for(lambda: job_status(second_id) == "done")
+    assert failures == [first_id]
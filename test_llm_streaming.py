@@ -0,0 +1,31 @@
+from llm_streaming import generate_text
+
+class FakeChunk:
+    def __init__(self, text=None):
+        self.parts = [text] if text is not None else []
+        self._text = text
+
+    @property
+    def text(self):
+        if not self.parts:
+            raise ValueError("The `response.text` quick accessor only works when the response contains a valid `Part`")
+        return self._text
+
+class FakeModel:
+    def __init__(self, chunks):
+        self.chunks = chunks
+
+    def generate_content(self, prompt, stream=False):
+        if stream:
+            return iter(self.chunks)
+        return FakeChunk("".join(chunk._text for chunk in self.chunks if chunk.parts))
+
+def test_streams_chunks_and_skips_partless_final_chunk():
+    model = FakeModel([FakeChunk("Restrict "), FakeChunk(""), FakeChunk("s3:*"), FakeChunk()])
+    tokens = []
+    assert generate_text(model, "prompt", tokens.append) == "Restrict s3:*"
+    assert tokens == ["Restrict ", "s3:*"]
+
+def test_without_callback_returns_full_text():
+    model = FakeModel([FakeChunk("Restrict "), FakeChunk("s3:*")])
+    assert generate_text(model, "prompt") == "Restrict s3:*"
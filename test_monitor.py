@@ -0,0 +1,128 @@
+import random
+import pytest
+import monitor
+
+@pytest.fixture
+def recorded(monkeypatch):
+    """Capture incidents instead of calling the LLM and writing them."""
+    incidents = []
+    monkeypatch.setattr(monitor, "record_incident", lambda incident_type, analysis: incidents.append((incident_type, analysis)))
+    return incidents
+
+def make_monitor(checks, intervals, seed=0):
+    clock = monitor.FakeClock()
+    return clock, monitor.Monitor(clock=clock, checks=checks, intervals=intervals, rng=random.Random(seed))
+
+def test_ticks_follow_jittered_interval():
+    clock, m = make_monitor({"kafka": lambda: 0}, {"kafka": 100})
+    times = []
+    for _ in range(6):
+        m.tick()
+        times.append(clock.now())
+    gaps = [later - earlier for earlier, later in zip(times, times[1:])]
+    assert all(90 <= gap <= 110 for gap in gaps)
+    assert len(set(gaps)) > 1
+
+def test_sources_run_on_independent_intervals():
+    clock, m = make_monitor({"fast": lambda: 0, "slow": lambda: 0}, {"fast": 10, "slow": 100})
+    sources = [m.tick() for _ in range(15)]
+    assert sources.count("fast") > sources.count("slow") >= 1
+
+def test_slow_check_backs_off_and_resets_on_recovery():
+    clock = monitor.FakeClock()
+    durations = [60, 60, 1]
+    def check():
+        clock.advance(durations.pop(0))
+        return 0
+    m = monitor.Monitor(clock=clock, checks={"iam": check}, intervals={"iam": 100}, rng=random.Random(0))
+    m.tick()
+    assert m.backoff["iam"] == 2
+    assert 190 <= m.next_run["iam"] - clock.now() <= 210
+    m.tick()
+    assert m.backoff["iam"] == 4
+    m.tick()
+    assert m.backoff["iam"] == 1
+    assert 90 <= m.next_run["iam"] - clock.now() <= 110
+
+def test_overdue_sources_run_immediately():
+    clock = monitor.FakeClock()
+    def slow_check():
+        clock.advance(50)
+        return 0
+    m = monitor.Monitor(
+        clock=clock,
+        checks={"iam": slow_check, "kafka": lambda: 0},
+        intervals={"iam": 100, "kafka": 10},
+        rng=random.Random(0)
+    )
+    m.next_run = {"iam": 0.0, "kafka": 1.0}
+    assert m.tick() == "iam"
+    # kafka was due at 1 but iam ran until 50, so kafka runs without sleeping
+    assert m.tick() == "kafka"
+    assert clock.now() == 50
+
+def test_failing_check_backs_off_up_to_max():
+    outcomes = [RuntimeError("source down")] * 5 + [None]
+    def check():
+        outcome = outcomes.pop(0)
+        if outcome:
+            raise outcome
+        return 0
+    clock, m = make_monitor({"infra": check}, {"infra": 100})
+    backoffs = []
+    for _ in range(6):
+        m.tick()
+        backoffs.append(m.backoff["infra"])
+    assert backoffs == [2, 4, 8, 8, 8, 1]
+
+def test_iam_watermark_skips_unchanged_versions(monkeypatch, recorded):
+    versions = {"arn:a": "v1", "arn:b": "v1"}
+    fetched = []
+    monkeypatch.setattr(monitor, "fetch_iam_policy_versions", lambda: dict(versions))
+    monkeypatch.setattr(monitor, "fetch_iam_policy_documents", lambda changed: fetched.append(changed) or [{}])
+    monkeypatch.setattr(monitor, "analyze_iam_policies", lambda policies: ["High risk"])
+    monkeypatch.setattr(monitor, "suggest_least_privilege_policy", lambda findings: ["Restrict"])
+    clock, m = make_monitor({"iam": monitor.check_iam}, {"iam": 100})
+
+    m.tick()
+    m.tick()
+    versions["arn:b"] = "v2"
+    m.tick()
+
+    assert fetched == [{"arn:a": "v1", "arn:b": "v1"}, {"arn:b": "v2"}]
+    assert len(recorded) == 2
+    assert monitor.get_watermark("iam") == {"arn:a": "v1", "arn:b": "v2"}
+
+def test_infra_watermark_skips_unchanged_shas(monkeypatch, recorded):
+    heads = {1: "aaa", 2: "bbb"}
+    analyzed = []
+    monkeypatch.setitem(monitor.CONFIG, "infra_repo", "user/repo")
+    monkeypatch.setattr(monitor, "fetch_open_pr_heads", lambda repo_name: dict(heads))
+    def summarize(repo_name, pr_number, fallback=True):
+        analyzed.append(pr_number)
+        return {"findings": ["f"], "suggestions": ["s"]}
+    monkeypatch.setattr(monitor, "summarize_infra", summarize)
+    clock, m = make_monitor({"infra": monitor.check_infra}, {"infra": 100})
+
+    m.tick()
+    m.tick()
+    heads[2] = "ccc"
+    m.tick()
+
+    assert analyzed == [1, 2, 2]
+    assert monitor.get_watermark("infra") == {"1": "aaa", "2": "ccc"}
+
+def test_infra_fetch_failure_keeps_watermark(monkeypatch, recorded):
+    monkeypatch.setitem(monitor.CONFIG, "infra_repo", "user/repo")
+    monkeypatch.setattr(monitor, "fetch_open_pr_heads", lambda repo_name: {1: "aaa"})
+    def summarize(repo_name, pr_number, fallback=True):
+        assert fallback is False
+        raise RuntimeError("GitHub unavailable")
+    monkeypatch.setattr(monitor, "summarize_infra", summarize)
+    clock, m = make_monitor({"infra": monitor.check_infra}, {"infra": 100})
+
+    m.tick()
+
+    assert m.backoff["infra"] == 2
+    assert recorded == []
+    assert monitor.get_watermark("infra") is None